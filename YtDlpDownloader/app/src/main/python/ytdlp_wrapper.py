@@ -7,34 +7,480 @@ import json
 import os
 import sys
 import re
-from typing import Dict, List, Optional, Callable, Any
+import time
+import hashlib
+import sqlite3
+from typing import Dict, List, Optional, Callable, Any, Union, Iterator, Iterable, FrozenSet
 import threading
 import queue
+import itertools
+import types
+import copy
+import pathlib
+import glob
+import shutil
+import urllib.parse
+import struct
+import zlib
+import contextlib
+import http.cookiejar
+import collections
+from contextvars import ContextVar
 
 # yt-dlp imports
 import yt_dlp
-from yt_dlp.utils import DownloadError
+from yt_dlp.utils import DownloadError, DownloadCancelled
+from yt_dlp.extractor.common import InfoExtractor
+from yt_dlp.postprocessor import FFmpegExtractAudioPP
+
+# Optional fast JSON codec for everything crossing the Python/Kotlin boundary
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Optional Hyperscan engine for matching URLs against all extractors at once
+try:
+    import hyperscan
+except ImportError:
+    hyperscan = None
+
+# Optional Aho-Corasick automaton for narrowing extractors by hostname
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+def _dumps(obj: Any) -> str:
+    """Serialize to a JSON string, preferring orjson when it is installed"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj).decode('utf-8')
+        except TypeError:
+            # e.g. non-str dict keys or >64-bit ints; json handles those
+            pass
+    return json.dumps(obj)
+
+
+def _loads(data: Union[str, bytes]) -> Any:
+    """Parse JSON, preferring orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+# Progress updates are emitted at most this often unless percent moved enough
+PROGRESS_MIN_INTERVAL = 0.25
+PROGRESS_MIN_STEP = 1.0
+
+# Download tuning; large HTTP chunks on WiFi, smaller ones on cellular to bound memory
+DEFAULT_BUFFER_SIZE = 256 * 1024
+WIFI_HTTP_CHUNK_SIZE = 10 * 1024 * 1024
+CELLULAR_HTTP_CHUNK_SIZE = 1024 * 1024
+WIFI_CONCURRENT_FRAGMENTS = 4
+CELLULAR_CONCURRENT_FRAGMENTS = 2
+
+# Bounds for the YoutubeDL pool: option profiles kept (least recently used is
+# dropped first) and idle instances kept per profile
+YDL_POOL_PROFILES = 8
+YDL_POOL_IDLE_PER_PROFILE = 3
+
+# Raw extraction results are kept briefly so a download right after browsing
+# the formats doesn't extract the same video again
+RAW_INFO_TTL = 60.0
+
+# A cancel for a download that hasn't started yet is remembered this long, so
+# it still applies if its download() call arrives just after the cancel
+CANCEL_TOMBSTONE_TTL = 30.0
+
+# yt-dlp format selectors per video quality
+_QUALITY_MAP_VIDEO = types.MappingProxyType({
+    'best': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
+    'high': 'bestvideo[height<=1080][ext=mp4]+bestaudio[ext=m4a]/best[height<=1080][ext=mp4]/best',
+    'medium': 'bestvideo[height<=720][ext=mp4]+bestaudio[ext=m4a]/best[height<=720][ext=mp4]/best',
+    'low': 'bestvideo[height<=480][ext=mp4]+bestaudio[ext=m4a]/best[height<=480][ext=mp4]/best',
+})
+
+# MP3 bitrates (kbps) per audio quality
+_QUALITY_MAP_AUDIO = types.MappingProxyType({
+    'best': '320',
+    'high': '256',
+    'medium': '192',
+    'low': '128',
+})
+
+# Every (format_type, quality) the app can request, resolved to its selector
+# up front so building the format string is a single lookup
+_MP3_FORMAT = 'bestaudio[ext=mp3]/bestaudio/best'
+_FORMAT_TABLE = types.MappingProxyType({
+    **{('mp4', q): fmt for q, fmt in _QUALITY_MAP_VIDEO.items()},
+    **{('mp3', q): _MP3_FORMAT for q in _QUALITY_MAP_VIDEO},
+})
+_DEFAULT_FORMAT = _FORMAT_TABLE[('mp4', 'best')]
+_DEFAULT_AUDIO_QUALITY = _QUALITY_MAP_AUDIO['medium']
+
+
+# Extractor lookup tables, built once on first use and shared by all wrappers
+_EXTRACTORS: Optional[List[InfoExtractor]] = None
+_FALLBACK_IDS: FrozenSet[int] = frozenset()
+_COMBINED_RE: Optional[re.Pattern] = None
+_extractors_lock = threading.Lock()
+
+# Optional Hyperscan database over the same patterns, built in the background
+_HS_DATABASE = None
+_HS_FALLBACK_IDS: FrozenSet[int] = frozenset()
+_hs_lock = threading.Lock()
+
+# Optional hostname -> extractor ids automaton (see _build_host_automaton)
+_HOST_AUTOMATON = None
+_HOST_LITERAL_RE = re.compile(r'(?<!\\)[a-z0-9-]+(?:\\\.[a-z0-9-]+)+', re.IGNORECASE)
+
+_LEADING_FLAGS_RE = re.compile(r'^\(\?([aiLmsux]+)\)')
+_NAMED_GROUP_RE = re.compile(r'\(\?P<[^>]+>')
+_BACKREF_RE = re.compile(r'\(\?P=|\(\?\(|\\[1-9]')
+
+
+def _union_fragment(pattern: str) -> Optional[str]:
+    """
+    Rewrite an extractor _VALID_URL so it can live inside one big alternation
+    
+    Leading global flags become scoped flags and named groups become
+    non-capturing (names repeat across extractors). Patterns relying on
+    backreferences can't be rewritten that way and return None.
+    """
+    if _BACKREF_RE.search(pattern):
+        return None
+    flags = _LEADING_FLAGS_RE.match(pattern)
+    body = _NAMED_GROUP_RE.sub('(?:', pattern[flags.end():] if flags else pattern)
+    if flags:
+        # In verbose mode, a newline keeps a trailing comment from swallowing the ')'
+        end = '\n)' if 'x' in flags.group(1) else ')'
+        return '(?%s:%s%s' % (flags.group(1), body, end)
+    return '(?:%s)' % body
+
+
+def _valid_url_patterns(extractor: InfoExtractor) -> List[str]:
+    """Return the _VALID_URL patterns of an extractor usable for regex lookup"""
+    valid_url = getattr(extractor, '_VALID_URL', None)
+    # Extractors with custom suitable() logic can't be decided by regex alone
+    if not valid_url or (
+            type(extractor).suitable.__func__ is not InfoExtractor.suitable.__func__):
+        return []
+    return [valid_url] if isinstance(valid_url, str) else list(valid_url)
+
+
+def _ensure_extractors() -> List[InfoExtractor]:
+    """Build the cached extractor list and combined _VALID_URL regex"""
+    global _EXTRACTORS, _FALLBACK_IDS, _COMBINED_RE, _HOST_AUTOMATON
+    if _EXTRACTORS is not None:
+        return _EXTRACTORS
+    
+    with _extractors_lock:
+        if _EXTRACTORS is not None:
+            return _EXTRACTORS
+        
+        extractors = [
+            e for e in yt_dlp.extractor.gen_extractors() if e.IE_NAME != 'generic'
+        ]
+        fallback = set()
+        alternatives = []
+        for index, extractor in enumerate(extractors):
+            fragments = [_union_fragment(p) for p in _valid_url_patterns(extractor)]
+            if not fragments or None in fragments:
+                fallback.add(index)
+                continue
+            alternatives.append('(?P<_ie%d>%s)' % (index, '|'.join(fragments)))
+        
+        try:
+            combined = re.compile('|'.join(alternatives)) if alternatives else None
+        except re.error:
+            combined = None
+        
+        _COMBINED_RE = combined
+        _FALLBACK_IDS = frozenset(fallback if combined is not None else range(len(extractors)))
+        if ahocorasick is not None:
+            _HOST_AUTOMATON = _build_host_automaton(extractors)
+        _EXTRACTORS = extractors
+        
+        if hyperscan is not None:
+            # Compiling takes seconds, so keep using the regex until it's ready
+            threading.Thread(
+                target=_build_hyperscan_db, args=(extractors,),
+                name='ytdlp-hyperscan', daemon=True
+            ).start()
+        return _EXTRACTORS
+
+
+def _host_literals(pattern: str) -> List[str]:
+    """Return the literal domain names in the host part of a _VALID_URL pattern"""
+    scheme_end = pattern.find('://')
+    if scheme_end < 0:
+        return []
+    host = pattern[scheme_end + 3:].split('/', 1)[0]
+    return [lit.replace('\\.', '.').lower() for lit in _HOST_LITERAL_RE.findall(host)]
+
+
+def _build_host_automaton(extractors: List[InfoExtractor]):
+    """
+    Map host literals (e.g. 'youtube.com') to the extractors whose URLs need them
+    
+    Only extractors where every _VALID_URL pattern names a literal host are
+    indexed; everything else is left to the regex lookup.
+    """
+    automaton = ahocorasick.Automaton()
+    for index, extractor in enumerate(extractors):
+        valid_url = getattr(extractor, '_VALID_URL', None)
+        if not valid_url:
+            continue
+        patterns = [valid_url] if isinstance(valid_url, str) else list(valid_url)
+        literals = [_host_literals(p) for p in patterns]
+        if not all(literals):
+            continue
+        for literal in set(itertools.chain.from_iterable(literals)):
+            ids = automaton.get(literal, None)
+            if ids is None:
+                automaton.add_word(literal, [index])
+            else:
+                ids.append(index)
+    automaton.make_automaton()
+    return automaton
+
+
+def _hyperscan_expression(pattern: str) -> bytes:
+    """Anchor a _VALID_URL pattern like re.match and keep its PCRE-compatible flags"""
+    flags = _LEADING_FLAGS_RE.match(pattern)
+    if flags is None:
+        return ('^(?:%s)' % pattern).encode('utf-8')
+    hs_flags = ''.join(f for f in flags.group(1) if f in 'imsx')
+    prefix = '(?%s)' % hs_flags if hs_flags else ''
+    end = '\n)' if 'x' in hs_flags else ')'
+    return ('%s^(?:%s%s' % (prefix, pattern[flags.end():], end)).encode('utf-8')
+
+
+def _build_hyperscan_db(extractors: List[InfoExtractor]):
+    """Compile every usable _VALID_URL into one Hyperscan prefilter database"""
+    global _HS_DATABASE, _HS_FALLBACK_IDS
+    # Prefilter mode tolerates constructs Hyperscan can't run exactly
+    # (lookarounds, backreferences); hits are confirmed with suitable()
+    hs_flags = hyperscan.HS_FLAG_PREFILTER | hyperscan.HS_FLAG_SINGLEMATCH
+    expressions = []
+    ids = []
+    fallback = set()
+    for index, extractor in enumerate(extractors):
+        patterns = _valid_url_patterns(extractor)
+        if not patterns:
+            fallback.add(index)
+        for pattern in patterns:
+            expression = _hyperscan_expression(pattern)
+            # A few patterns are still rejected (too long, unsupported escapes)
+            try:
+                hyperscan.Database().compile(
+                    expressions=[expression], ids=[index], flags=[hs_flags]
+                )
+            except hyperscan.error:
+                fallback.add(index)
+                continue
+            expressions.append(expression)
+            ids.append(index)
+    
+    try:
+        database = hyperscan.Database()
+        database.compile(
+            expressions=expressions, ids=ids, flags=[hs_flags] * len(expressions)
+        )
+    except hyperscan.error:
+        return
+    
+    with _hs_lock:
+        _HS_FALLBACK_IDS = frozenset(fallback)
+        _HS_DATABASE = database
+
+
+def _collect_hyperscan_hit(id_: int, start: int, end: int, flags: int, hits: set):
+    hits.add(id_)
+
+
+def _first_suitable(extractors: List[InfoExtractor],
+                    indices: Iterable[int],
+                    url: str) -> Optional[InfoExtractor]:
+    """Return the first extractor among indices (in yt-dlp order) accepting url"""
+    for index in indices:
+        if extractors[index].suitable(url):
+            return extractors[index]
+    return None
+
+
+def _match_extractor(url: str) -> Optional[InfoExtractor]:
+    """Find the extractor that would handle url, ignoring the generic one"""
+    extractors = _ensure_extractors()
+    
+    if _HOST_AUTOMATON is not None:
+        # One pass over the hostname yields the few extractors keyed to it;
+        # on a miss the full lookup below still runs
+        try:
+            host = urllib.parse.urlsplit(url).hostname
+        except ValueError:
+            host = None
+        if host:
+            hits = {i for _, ids in _HOST_AUTOMATON.iter(host) for i in ids}
+            found = _first_suitable(extractors, sorted(hits), url)
+            if found is not None:
+                return found
+    
+    # The database is byte/ASCII based (Unicode classes make compiling far
+    # slower), so non-ASCII URLs take the regex path instead
+    if _HS_DATABASE is not None and url.isascii():
+        hits: set = set()
+        with _hs_lock:
+            _HS_DATABASE.scan(
+                url.encode('utf-8'),
+                match_event_handler=_collect_hyperscan_hit,
+                context=hits
+            )
+        # Prefilter hits are a superset of the real matches, so confirming
+        # them plus the unindexed extractors is exact
+        return _first_suitable(extractors, sorted(hits | _HS_FALLBACK_IDS), url)
+    
+    match = _COMBINED_RE.match(url) if _COMBINED_RE is not None else None
+    candidates = set(_FALLBACK_IDS)
+    if match is not None:
+        candidates.add(int(match.lastgroup[3:]))
+    found = _first_suitable(extractors, sorted(candidates), url)
+    if found is None and match is not None:
+        # The regex hit an extractor that then declined; check the rest properly
+        found = _first_suitable(extractors, range(len(extractors)), url)
+    return found
+
+
+def _summarize_format(fmt: Dict[str, Any]) -> Dict[str, Any]:
+    """Reduce a yt-dlp format dict to the fields the app displays"""
+    get = fmt.get
+    return {
+        'format_id': get('format_id', ''),
+        'ext': get('ext', ''),
+        'quality': get('quality_label') or get('format_note', 'unknown'),
+        'resolution': get('resolution', 'unknown'),
+        'filesize': get('filesize') or get('filesize_approx'),
+        'has_video': get('vcodec', 'none') != 'none',
+        'has_audio': get('acodec', 'none') != 'none',
+        'video_codec': get('vcodec'),
+        'audio_codec': get('acodec'),
+        'fps': get('fps'),
+        'bitrate': get('tbr'),
+    }
+
+
+# Fixed 40-byte little-endian record for the binary progress pipe: status,
+# 3 pad bytes, slot (CRC32 of the download_id), downloaded bytes, total bytes,
+# speed (bytes/s), eta (s), percent * 100
+PROGRESS_RECORD = struct.Struct('<B3xIQQQII')
+PROGRESS_STATUS_DOWNLOADING = 1
+_UINT32_MAX = 0xFFFFFFFF
+
+
+def progress_slot(download_id: str) -> int:
+    """Numeric id for a download in binary progress records (CRC32 of its UTF-8 id)"""
+    return zlib.crc32(download_id.encode('utf-8'))
+
+
+class ProgressPipe:
+    """
+    Writes fixed-size progress records to a file descriptor (e.g. a pipe from Kotlin)
+    
+    Each record is a single os.write well under PIPE_BUF, so records from
+    concurrent downloads never interleave. The fd is expected to be
+    non-blocking: while the reader lags behind, records are dropped rather
+    than stalling the download (and its cancel check).
+    """
+    
+    def __init__(self, fd: int):
+        self.fd = fd
+    
+    def write(self, slot: int, downloaded: int, total: int,
+              speed: float, eta: float, percent: float) -> bool:
+        """Write one 'downloading' record; returns False if the pipe is unusable"""
+        record = PROGRESS_RECORD.pack(
+            PROGRESS_STATUS_DOWNLOADING,
+            slot,
+            max(int(downloaded), 0),
+            max(int(total), 0),
+            max(int(speed), 0),
+            min(max(int(eta), 0), _UINT32_MAX),
+            min(max(int(percent * 100), 0), 10000),
+        )
+        try:
+            os.write(self.fd, record)
+        except BlockingIOError:
+            # Pipe full; skip this update, a later one supersedes it anyway
+            pass
+        except OSError:
+            return False
+        return True
 
 
 class ProgressHook:
     """Custom progress hook for tracking download progress"""
     
-    def __init__(self, callback: Optional[Callable] = None):
+    def __init__(self,
+                 callback: Optional[Callable] = None,
+                 min_interval: float = PROGRESS_MIN_INTERVAL,
+                 min_step: float = PROGRESS_MIN_STEP,
+                 cancel_event: Optional[threading.Event] = None,
+                 pipe: Optional[ProgressPipe] = None,
+                 slot: int = 0):
         self.callback = callback
-        self.last_progress = 0
+        self.cancel_event = cancel_event
+        self.pipe = pipe
+        self.slot = slot
+        self.min_interval = min_interval
+        self.min_step = min_step
+        self.last_progress = -1.0
+        self._last_emit = 0.0
+        # Every file yt-dlp reported writing (e.g. each .fNNN part of a merged
+        # download), so a cancelled download can clean all of them up
+        self.files: List[str] = []
         
     def __call__(self, d: Dict[str, Any]):
+        for name in (d.get('tmpfilename'), d.get('filename')):
+            if name and name not in self.files:
+                self.files.append(name)
+        
+        # Raising here aborts yt-dlp between chunks instead of at end of file
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise DownloadCancelled()
+        
         if d['status'] == 'downloading':
+            if not self.callback and self.pipe is None:
+                return
+            # yt-dlp calls this per chunk; only forward meaningful updates
+            percent = self._calculate_percent(d)
+            now = time.monotonic()
+            if (now - self._last_emit < self.min_interval
+                    and abs(percent - self.last_progress) < self.min_step):
+                return
+            self._last_emit = now
+            self.last_progress = percent
+            
+            downloaded = d.get('downloaded_bytes') or 0
+            total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+            if self.pipe is not None:
+                # Raw record straight to Kotlin: no dict, JSON or str round-trip
+                if self.pipe.write(self.slot, downloaded, total,
+                                   d.get('speed') or 0, d.get('eta') or 0, percent):
+                    return
+                self.pipe = None
+            if not self.callback:
+                return
+            
             progress_data = {
                 'status': 'downloading',
-                'downloaded_bytes': d.get('downloaded_bytes', 0),
-                'total_bytes': d.get('total_bytes') or d.get('total_bytes_estimate', 0),
+                'downloaded_bytes': downloaded,
+                'total_bytes': total,
                 'speed': d.get('speed', 0),
                 'eta': d.get('eta', 0),
-                'percent': self._calculate_percent(d)
+                'percent': percent
             }
-            if self.callback:
-                self.callback(progress_data)
+            self.callback(progress_data)
                 
         elif d['status'] == 'finished':
             progress_data = {
@@ -53,39 +499,409 @@ class ProgressHook:
         return 0
 
 
+class MetadataCache:
+    """Persistent sqlite-backed cache for sanitized extraction results"""
+    
+    # Bump whenever the shape of the cached (sanitized) info changes
+    SCHEMA_VERSION = 2
+    
+    def __init__(self, path: str, ttl: float = 6 * 60 * 60, size_limit: int = 32 * 1024 * 1024):
+        self.ttl = ttl
+        self.size_limit = size_limit
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS meta ('
+            'key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)'
+        )
+        self._conn.commit()
+    
+    def make_key(self, *parts: Any) -> str:
+        """Build a stable cache key from the given parts"""
+        raw = '\x1f'.join(str(p) for p in (self.SCHEMA_VERSION,) + parts)
+        return hashlib.blake2b(raw.encode('utf-8'), digest_size=20).hexdigest()
+    
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached value for key, or None if missing/expired/unreadable"""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    'SELECT value, expires FROM meta WHERE key = ?', (key,)
+                ).fetchone()
+            if row is None:
+                return None
+            value, expires = row
+            if expires < time.time():
+                self.delete(key)
+                return None
+            try:
+                return _loads(value)
+            except ValueError:
+                self.delete(key)
+                return None
+        except sqlite3.Error:
+            # e.g. closed by a concurrent shutdown or an I/O error; treat as a miss
+            return None
+    
+    def set(self, key: str, value: Dict[str, Any]):
+        """Store value under key, evicting expired/oldest rows over the size limit"""
+        payload = _dumps(value)
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO meta (key, value, expires) VALUES (?, ?, ?)',
+                (key, payload, time.time() + self.ttl)
+            )
+            self._evict()
+            self._conn.commit()
+    
+    def delete(self, key: str):
+        """Remove a single entry"""
+        with self._lock:
+            self._conn.execute('DELETE FROM meta WHERE key = ?', (key,))
+            self._conn.commit()
+    
+    def clear(self):
+        """Remove all cached entries"""
+        with self._lock:
+            self._conn.execute('DELETE FROM meta')
+            self._conn.commit()
+    
+    def close(self):
+        """Close the underlying sqlite connection"""
+        with self._lock:
+            self._conn.close()
+    
+    def _evict(self):
+        # Caller must hold self._lock
+        self._conn.execute('DELETE FROM meta WHERE expires < ?', (time.time(),))
+        total = self._conn.execute(
+            'SELECT COALESCE(SUM(LENGTH(value)), 0) FROM meta'
+        ).fetchone()[0]
+        if total <= self.size_limit:
+            return
+        # Oldest entries expire first, so drop in expiry order until under the limit
+        for key, size in self._conn.execute(
+                'SELECT key, LENGTH(value) FROM meta ORDER BY expires').fetchall():
+            self._conn.execute('DELETE FROM meta WHERE key = ?', (key,))
+            total -= size
+            if total <= self.size_limit:
+                break
+
+
 class YtdlpWrapper:
     """Wrapper class for yt-dlp functionality"""
     
-    def __init__(self, download_dir: str):
+    # Metadata-only extraction: no format probing, playlists consumed lazily
+    _BASE_EXTRACT_OPTS = {
+        'quiet': True,
+        'no_warnings': True,
+        'skip_download': True,
+        'check_formats': False,
+        'lazy_playlist': True,
+    }
+    
+    # Options that vary per call (e.g. one value per playlist page); they are
+    # applied to a pooled instance for the call instead of keying the pool
+    _PER_CALL_OPTS = frozenset({'playlist_items'})
+    
+    def __init__(self,
+                 download_dir: str,
+                 cache_ttl: float = 6 * 60 * 60,
+                 cache_mb: int = 32,
+                 buffer_size: int = DEFAULT_BUFFER_SIZE,
+                 http_chunk_size: int = WIFI_HTTP_CHUNK_SIZE,
+                 concurrent_fragments: int = WIFI_CONCURRENT_FRAGMENTS,
+                 use_aria2c: bool = False):
         self.download_dir = download_dir
+        self.aria2c_path = shutil.which('aria2c') if use_aria2c else None
+        self.buffer_size = buffer_size
+        self.http_chunk_size = http_chunk_size
+        self.concurrent_fragments = concurrent_fragments
         self._active_downloads: Dict[str, Any] = {}
-        self._cancelled: set = set()
+        # Cancel flags for queued and running downloads only (see expect_download);
+        # Event is thread-safe so the hot progress path needs no lock
+        self._cancel_events: Dict[str, threading.Event] = {}
+        # Cancels that arrived before their download registered (id -> time)
+        self._early_cancels: Dict[str, float] = {}
         self._lock = threading.Lock()
+        # Idle YoutubeDL instances per options profile, least recently used first.
+        # YoutubeDL isn't thread-safe, so an instance is checked out by one caller
+        # at a time rather than shared
+        self._ydl_pool: 'collections.OrderedDict[FrozenSet, List[yt_dlp.YoutubeDL]]' = \
+            collections.OrderedDict()
+        self._ydl_closed = False
+        self._raw_info_cache: Dict[tuple, tuple] = {}
+        self.progress_pipe: Optional[ProgressPipe] = None
+        try:
+            self._cache: Optional[MetadataCache] = MetadataCache(
+                os.path.join(download_dir, '.meta_cache.sqlite'),
+                ttl=cache_ttl,
+                size_limit=cache_mb * 1024 * 1024,
+            )
+        except sqlite3.Error:
+            # The cache is only an optimization; run without it
+            self._cache = None
         
-    def extract_info(self, url: str, extract_flat: bool = False) -> Dict[str, Any]:
+    def extract_info(self,
+                     url: str,
+                     extract_flat: Union[bool, str] = 'in_playlist',
+                     refresh: bool = False,
+                     playlist_items: Optional[str] = None) -> Dict[str, Any]:
         """
         Extract video/playlist information without downloading
         
+        Playlist entries are listed flat by default (one request for the whole
+        playlist); use extract_entry() to resolve a single entry on demand.
+        
         Args:
             url: The URL to extract info from
-            extract_flat: If True, extract playlist entries without full info
+            extract_flat: yt-dlp extract_flat mode; 'in_playlist' lists playlist
+                entries without resolving each video, False resolves everything
+            refresh: If True, bypass the metadata cache and re-extract
+            playlist_items: Optional yt-dlp item spec (e.g. '1:50') to page
+                through a playlist
             
         Returns:
             Dictionary containing video/playlist information
         """
-        ydl_opts = {
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': extract_flat,
-            'skip_download': True,
-        }
+        extra_opts: Dict[str, Any] = {'extract_flat': extract_flat}
+        if playlist_items is not None:
+            extra_opts['playlist_items'] = playlist_items
+        return self._extract_cached(url, extra_opts, refresh)
+    
+    def extract_info_stream(self,
+                            url: str,
+                            start: int = 0,
+                            limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Yield sanitized playlist entries as yt-dlp discovers them
+        
+        Entries are pulled from the extractor page by page, so callers can show
+        results before the whole playlist has been enumerated. A single video
+        yields one sanitized info dict.
         
+        Args:
+            url: The playlist (or video) URL
+            start: Index of the first entry to yield
+            limit: Maximum number of entries to yield
+        """
+        ydl_opts = dict(self._BASE_EXTRACT_OPTS, extract_flat='in_playlist')
         try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
-                return self._sanitize_info(info)
+            with self._pooled_ydl(ydl_opts) as ydl:
+                info = ydl.extract_info(url, download=False, process=False)
+                # Short and embed links (e.g. youtu.be/ID?list=...) come back as
+                # url results; follow them until the playlist or video shows up
+                while info and info.get('_type') in ('url', 'url_transparent'):
+                    info = ydl.extract_info(
+                        info['url'], download=False, ie_key=info.get('ie_key'), process=False
+                    )
+                entries = info.get('entries') if info else None
+                if entries is None:
+                    yield self._sanitize_info(ydl.process_ie_result(info, download=False))
+                    return
+                stop = None if limit is None else start + limit
+                yield from self._iter_entries(itertools.islice(entries, start, stop))
+        except Exception as e:
+            yield {'error': str(e), 'url': url}
+    
+    def extract_entry(self, url: str, refresh: bool = False) -> Dict[str, Any]:
+        """
+        Extract full information for a single video (e.g. a playlist entry)
+        
+        Args:
+            url: The video URL
+            refresh: If True, bypass the metadata cache and re-extract
+            
+        Returns:
+            Dictionary containing video information
+        """
+        return self._extract_cached(
+            url, {'extract_flat': False, 'noplaylist': True}, refresh
+        )
+    
+    def _extract_cached(self,
+                        url: str,
+                        extra_opts: Dict[str, Any],
+                        refresh: bool) -> Dict[str, Any]:
+        """Run an info extraction, serving from the metadata cache when possible"""
+        cache = self._cache
+        key = cache.make_key(url, sorted(extra_opts.items())) if cache is not None else None
+        if cache is not None and not refresh:
+            cached = cache.get(key)
+            if cached is not None:
+                return cached
+        
+        ydl_opts = dict(self._BASE_EXTRACT_OPTS)
+        call_params = {}
+        for name, value in extra_opts.items():
+            if name in self._PER_CALL_OPTS:
+                call_params[name] = value
+            else:
+                ydl_opts[name] = value
+        
+        try:
+            with self._pooled_ydl(ydl_opts, call_params) as ydl:
+                raw = ydl.extract_info(url, download=False, process=False)
+                # download() never uses noplaylist, so only those results are kept
+                if (raw and raw.get('_type', 'video') == 'video'
+                        and not ydl_opts.get('noplaylist')):
+                    self._snapshot_raw_info(url, raw, ydl)
+                info = ydl.process_ie_result(raw, download=False)
+                result = self._sanitize_info(info)
         except Exception as e:
             return {'error': str(e), 'url': url}
+        
+        if result and cache is not None:
+            try:
+                cache.set(key, result)
+            except (TypeError, ValueError, sqlite3.Error):
+                # A cache write failure must never fail the extraction itself
+                pass
+        return result
+    
+    def _snapshot_raw_info(self, url: str, raw: Dict[str, Any], ydl: yt_dlp.YoutubeDL):
+        """
+        Keep a pristine copy of raw (processing mutates it) for download(),
+        along with the session cookies its media URLs may need
+        
+        Some results can't be copied (e.g. lazy fragment lists over a
+        generator); those are simply not reused.
+        """
+        try:
+            snapshot = copy.deepcopy(raw)
+        except Exception:
+            return
+        self._store_raw_info(url, False, snapshot, list(ydl.cookiejar))
+    
+    def _store_raw_info(self,
+                        url: str,
+                        noplaylist: bool,
+                        raw: Dict[str, Any],
+                        cookies: List[http.cookiejar.Cookie]):
+        """
+        Remember an unprocessed extraction result for RAW_INFO_TTL seconds
+        
+        Results are keyed on noplaylist too, since some extractors return a
+        single video instead of the playlist when it is set.
+        """
+        now = time.monotonic()
+        with self._lock:
+            for key, (stored, _, _) in list(self._raw_info_cache.items()):
+                if now - stored > RAW_INFO_TTL:
+                    del self._raw_info_cache[key]
+            self._raw_info_cache[(url, noplaylist)] = (now, raw, cookies)
+    
+    def _take_raw_info(self, url: str, noplaylist: bool) -> Optional[tuple]:
+        """Remove and return a fresh (raw info, cookies) pair for url, if any"""
+        with self._lock:
+            entry = self._raw_info_cache.pop((url, noplaylist), None)
+        if entry is None or time.monotonic() - entry[0] > RAW_INFO_TTL:
+            return None
+        return entry[1], entry[2]
+    
+    @contextlib.contextmanager
+    def _pooled_ydl(self,
+                    ydl_opts: Dict[str, Any],
+                    call_params: Optional[Dict[str, Any]] = None) -> Iterator[yt_dlp.YoutubeDL]:
+        """
+        Check out a reusable YoutubeDL for these options
+        
+        Reusing the instance keeps its in-memory cookie jar and HTTP connections
+        alive across calls instead of paying construction and TLS setup every
+        time. The instance is returned to the pool on exit; the pool is bounded
+        by YDL_POOL_PROFILES and YDL_POOL_IDLE_PER_PROFILE, and surplus
+        instances are closed.
+        
+        ydl_opts should be a stable profile, since it keys the pool. call_params
+        are set on the instance's params for this checkout only, and must be
+        options yt-dlp reads at call time rather than in the constructor.
+        """
+        key = frozenset(ydl_opts.items())
+        ydl = None
+        with self._lock:
+            idle = self._ydl_pool.get(key)
+            if idle:
+                ydl = idle.pop()
+        if ydl is None:
+            ydl = yt_dlp.YoutubeDL(dict(ydl_opts))
+        call_params = call_params or {}
+        saved = {name: ydl.params.get(name) for name in call_params}
+        ydl.params.update(call_params)
+        try:
+            yield ydl
+        finally:
+            for name, value in saved.items():
+                if value is None:
+                    ydl.params.pop(name, None)
+                else:
+                    ydl.params[name] = value
+            self._release_ydl(key, ydl)
+    
+    def _release_ydl(self, key: FrozenSet, ydl: yt_dlp.YoutubeDL):
+        """Return a checked-out instance to the pool, closing whatever doesn't fit"""
+        surplus: List[yt_dlp.YoutubeDL] = []
+        with self._lock:
+            idle = self._ydl_pool.get(key)
+            if idle is None:
+                idle = self._ydl_pool[key] = []
+            self._ydl_pool.move_to_end(key)
+            if self._ydl_closed or len(idle) >= YDL_POOL_IDLE_PER_PROFILE:
+                surplus.append(ydl)
+            else:
+                idle.append(ydl)
+            while len(self._ydl_pool) > YDL_POOL_PROFILES:
+                _, evicted = self._ydl_pool.popitem(last=False)
+                surplus.extend(evicted)
+        self._close_all(surplus)
+    
+    @staticmethod
+    def _close_all(instances: Iterable[yt_dlp.YoutubeDL]):
+        for ydl in instances:
+            try:
+                ydl.close()
+            except Exception:
+                pass
+    
+    def close(self):
+        """
+        Close pooled YoutubeDL instances and the metadata cache
+        
+        Instances still checked out are closed when they are released.
+        """
+        with self._lock:
+            self._ydl_closed = True
+            pools, self._ydl_pool = list(self._ydl_pool.values()), collections.OrderedDict()
+        self._close_all(ydl for idle in pools for ydl in idle)
+        if self._cache is not None:
+            self._cache.close()
+    
+    def clear_metadata_cache(self) -> bool:
+        """Drop all cached extraction results; returns False if the cache is unavailable"""
+        if self._cache is None:
+            return False
+        try:
+            self._cache.clear()
+        except sqlite3.Error:
+            return False
+        return True
+    
+    def set_progress_fd(self, fd: int):
+        """Send 'downloading' updates as binary records to fd (negative disables)"""
+        if fd < 0:
+            self.progress_pipe = None
+            return
+        # A stalled reader must never block the download thread
+        os.set_blocking(fd, False)
+        self.progress_pipe = ProgressPipe(fd)
+    
+    def set_network_profile(self, cellular: bool):
+        """Switch download chunking between the WiFi and cellular presets"""
+        if cellular:
+            self.http_chunk_size = CELLULAR_HTTP_CHUNK_SIZE
+            self.concurrent_fragments = CELLULAR_CONCURRENT_FRAGMENTS
+        else:
+            self.http_chunk_size = WIFI_HTTP_CHUNK_SIZE
+            self.concurrent_fragments = WIFI_CONCURRENT_FRAGMENTS
     
     def get_available_formats(self, url: str) -> List[Dict[str, Any]]:
         """
@@ -101,26 +917,8 @@ class YtdlpWrapper:
         if 'error' in info:
             return []
         
-        formats = info.get('formats', [])
-        result = []
-        
-        for fmt in formats:
-            format_info = {
-                'format_id': fmt.get('format_id', ''),
-                'ext': fmt.get('ext', ''),
-                'quality': fmt.get('quality_label') or fmt.get('format_note', 'unknown'),
-                'resolution': fmt.get('resolution', 'unknown'),
-                'filesize': fmt.get('filesize') or fmt.get('filesize_approx'),
-                'has_video': fmt.get('vcodec', 'none') != 'none',
-                'has_audio': fmt.get('acodec', 'none') != 'none',
-                'video_codec': fmt.get('vcodec'),
-                'audio_codec': fmt.get('acodec'),
-                'fps': fmt.get('fps'),
-                'bitrate': fmt.get('tbr'),
-            }
-            result.append(format_info)
-        
-        return result
+        # Formats are already summarized (and cached) by _sanitize_info
+        return info.get('formats', [])
     
     def download(self, 
                  url: str,
@@ -141,119 +939,194 @@ class YtdlpWrapper:
         Returns:
             Dictionary with download result
         """
-        if download_id in self._cancelled:
-            self._cancelled.discard(download_id)
-            return {'success': False, 'error': 'Download cancelled by user'}
+        with self._lock:
+            cancel_event = self._cancel_events.setdefault(download_id, threading.Event())
+            cancelled_at = self._early_cancels.pop(download_id, None)
+            if cancelled_at is not None and time.monotonic() - cancelled_at <= CANCEL_TOMBSTONE_TTL:
+                cancel_event.set()
+        if cancel_event.is_set():
+            self._cancel_events.pop(download_id, None)
+            return {'success': False, 'cancelled': True, 'error': 'Download cancelled by user'}
+        
+        format_type = format_type.lower()
         
         # Build format string based on type and quality
         format_string = self._build_format_string(format_type, quality)
         
         # Progress hook
-        progress_hook = ProgressHook(progress_callback)
-        
-        # Postprocessor for audio extraction if needed
-        postprocessors = []
-        if format_type.lower() == 'mp3':
-            postprocessors.append({
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': self._get_audio_quality(quality),
-            })
+        progress_hook = ProgressHook(
+            progress_callback,
+            cancel_event=cancel_event,
+            pipe=self.progress_pipe,
+            slot=progress_slot(download_id)
+        )
         
         ydl_opts = {
             'format': format_string,
             'outtmpl': os.path.join(self.download_dir, '%(title)s.%(ext)s'),
             'progress_hooks': [progress_hook],
-            'postprocessors': postprocessors,
             'noplaylist': False,
             'continuedl': True,
             'retries': 10,
             'fragment_retries': 10,
             'skip_unavailable_fragments': True,
             'keep_fragments': False,
-            'buffersize': 1024 * 16,
-            'http_chunk_size': 1024 * 1024,
+            'buffersize': self.buffer_size,
+            'http_chunk_size': self.http_chunk_size,
+            'concurrent_fragment_downloads': self.concurrent_fragments,
             'quiet': True,
             'no_warnings': False,
         }
+        if self.aria2c_path:
+            # yt-dlp already runs aria2c with 16 connections per file and 1MB
+            # pieces. It only reports aria2c progress on completion, so the
+            # throttled per-chunk updates (and mid-file cancel) don't apply here
+            ydl_opts['external_downloader'] = {'http': self.aria2c_path}
         
         try:
             with self._lock:
                 self._active_downloads[download_id] = True
             
+            # Reuse a just-extracted result (e.g. from get_available_formats);
+            # taking it also invalidates it, so a failed attempt re-extracts
+            raw = None
+            reused = self._take_raw_info(url, noplaylist=ydl_opts['noplaylist'])
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True)
+                if reused is not None:
+                    raw, cookies = reused
+                    for cookie in cookies:
+                        ydl.cookiejar.set_cookie(cookie)
+                if format_type == 'mp3':
+                    if raw is None:
+                        raw = ydl.extract_info(url, download=False, process=False)
+                    # For a single video, pick the format first so the transcode
+                    # can be skipped when it is already MP3; playlist entries are
+                    # still extracted and downloaded one at a time
+                    if raw and raw.get('_type', 'video') == 'video':
+                        raw = ydl.process_ie_result(raw, download=False)
+                        if cancel_event.is_set():
+                            raise DownloadCancelled()
+                    if not (raw and self._is_mp3(raw)):
+                        ydl.add_post_processor(FFmpegExtractAudioPP(
+                            ydl,
+                            preferredcodec='mp3',
+                            preferredquality=self._get_audio_quality(quality),
+                        ))
+                if raw is not None:
+                    info = ydl.process_ie_result(raw, download=True)
+                else:
+                    info = ydl.extract_info(url, download=True)
                 filename = ydl.prepare_filename(info)
+            
+            # Adjust filename for audio files
+            if format_type == 'mp3':
+                filename = os.path.splitext(filename)[0] + '.mp3'
+            
+            if cancel_event.is_set():
+                # Cancelled after the last chunk; delete the finished file
+                self._discard_file(filename)
+                return {'success': False, 'cancelled': True, 'error': 'Download cancelled'}
+            
+            return {
+                'success': True,
+                'filename': filename,
+                'title': info.get('title', 'Unknown'),
+                'duration': info.get('duration'),
+                'uploader': info.get('uploader'),
+            }
                 
-                # Adjust filename for audio files
-                if format_type.lower() == 'mp3':
-                    filename = os.path.splitext(filename)[0] + '.mp3'
-                
-                with self._lock:
-                    if download_id in self._cancelled:
-                        self._cancelled.discard(download_id)
-                        # Try to delete partial file
-                        try:
-                            if os.path.exists(filename):
-                                os.remove(filename)
-                        except:
-                            pass
-                        return {'success': False, 'error': 'Download cancelled'}
-                
-                return {
-                    'success': True,
-                    'filename': filename,
-                    'title': info.get('title', 'Unknown'),
-                    'duration': info.get('duration'),
-                    'uploader': info.get('uploader'),
-                }
-                
+        except DownloadCancelled:
+            for name in progress_hook.files:
+                self._discard_partial(name)
+            return {'success': False, 'cancelled': True, 'error': 'Download cancelled'}
         except DownloadError as e:
             return {'success': False, 'error': str(e)}
         except Exception as e:
             return {'success': False, 'error': f'Unexpected error: {str(e)}'}
         finally:
+            self._cancel_events.pop(download_id, None)
             with self._lock:
                 self._active_downloads.pop(download_id, None)
     
-    def cancel_download(self, download_id: str):
-        """Mark a download for cancellation"""
+    def _discard_file(self, path: str):
+        """Best-effort removal of a file left behind by a cancelled download"""
+        try:
+            pathlib.Path(path).unlink(missing_ok=True)
+        except OSError:
+            pass
+    
+    def _discard_partial(self, path: str):
+        """Remove a cancelled download's file with its fragment and .ytdl state files"""
+        self._discard_file(path)
+        self._discard_file(path + '.ytdl')
+        target = pathlib.Path(path)
+        for fragment in target.parent.glob(glob.escape(target.name) + '-Frag*'):
+            self._discard_file(str(fragment))
+    
+    def expect_download(self, download_id: str):
+        """Register a download that will start later (e.g. queued) so it can be cancelled before it runs"""
+        self._cancel_events.setdefault(download_id, threading.Event())
+    
+    def forget_download(self, download_id: str):
+        """Drop the cancel flag of an expected download that will never run"""
+        self._cancel_events.pop(download_id, None)
+    
+    def cancel_download(self, download_id: str) -> bool:
+        """
+        Mark a download for cancellation; takes effect at the next progress tick
+        
+        Returns False if download_id is neither running nor expected (e.g. it
+        already finished). The cancel is still remembered for
+        CANCEL_TOMBSTONE_TTL seconds in case its download() is about to start.
+        """
         with self._lock:
-            self._cancelled.add(download_id)
+            cancel_event = self._cancel_events.get(download_id)
+            if cancel_event is None:
+                now = time.monotonic()
+                for key, stored in list(self._early_cancels.items()):
+                    if now - stored > CANCEL_TOMBSTONE_TTL:
+                        del self._early_cancels[key]
+                self._early_cancels[download_id] = now
+                return False
             self._active_downloads.pop(download_id, None)
+        cancel_event.set()
+        return True
     
     def is_valid_url(self, url: str) -> bool:
         """Check if URL is supported by yt-dlp"""
-        extractors = yt_dlp.extractor.gen_extractors()
-        for extractor in extractors:
-            if extractor.suitable(url) and extractor.IE_NAME != 'generic':
-                return True
-        return False
+        return _match_extractor(url) is not None
+    
+    def match_extractor(self, url: str) -> Optional[str]:
+        """Return the name of the extractor that handles url, or None if unsupported"""
+        extractor = _match_extractor(url)
+        return extractor.IE_NAME if extractor is not None else None
     
     def _build_format_string(self, format_type: str, quality: str) -> str:
         """Build yt-dlp format string based on preferences"""
-        if format_type.lower() == 'mp3':
-            # For audio, get best audio only
-            return 'bestaudio/best'
-        
-        # Video formats
-        quality_map = {
-            'best': 'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
-            'high': 'bestvideo[height<=1080][ext=mp4]+bestaudio[ext=m4a]/best[height<=1080][ext=mp4]/best',
-            'medium': 'bestvideo[height<=720][ext=mp4]+bestaudio[ext=m4a]/best[height<=720][ext=mp4]/best',
-            'low': 'bestvideo[height<=480][ext=mp4]+bestaudio[ext=m4a]/best[height<=480][ext=mp4]/best',
-        }
-        return quality_map.get(quality, quality_map['best'])
+        # For mp3, best audio only, preferring sources that need no transcode
+        format_type, quality = format_type.lower(), quality.lower()
+        fmt = _FORMAT_TABLE.get((format_type, quality))
+        if fmt is not None:
+            return fmt
+        if format_type == 'mp3':
+            return _MP3_FORMAT
+        return _QUALITY_MAP_VIDEO.get(quality, _DEFAULT_FORMAT)
+    
+    def _is_mp3(self, info: Dict[str, Any]) -> bool:
+        """Check whether the selected format of a video is already an MP3 file"""
+        if info.get('_type', 'video') != 'video' or info.get('requested_formats'):
+            return False
+        return info.get('ext') == 'mp3' and info.get('acodec') in (None, 'mp3')
     
     def _get_audio_quality(self, quality: str) -> str:
         """Get audio quality setting for MP3"""
-        quality_map = {
-            'best': '320',
-            'high': '256',
-            'medium': '192',
-            'low': '128',
-        }
-        return quality_map.get(quality, '192')
+        return _QUALITY_MAP_AUDIO.get(quality.lower(), _DEFAULT_AUDIO_QUALITY)
+    
+    def _iter_entries(self, entries: Iterable[Optional[Dict[str, Any]]]) -> Iterator[Dict[str, Any]]:
+        """Lazily reduce playlist entries to id/title/url, skipping unavailable ones"""
+        for entry in entries:
+            if entry:
+                yield {'id': entry.get('id'), 'title': entry.get('title'), 'url': entry.get('url')}
     
     def _sanitize_info(self, info: Dict[str, Any]) -> Dict[str, Any]:
         """Sanitize and simplify info dictionary"""
@@ -276,42 +1149,384 @@ class YtdlpWrapper:
         # Check if it's a playlist
         entries = info.get('entries')
         if entries is not None:
+            # Consume the entries iterator exactly once and keep what it yielded;
+            # counting it separately would exhaust it (and, when not flat, fetch
+            # every video a second time)
+            entries_list = list(self._iter_entries(entries))
             result['is_playlist'] = True
-            result['playlist_count'] = len(list(entries)) if entries else 0
+            result['entries'] = entries_list
+            # With playlist_items paging only a slice is returned, so prefer the
+            # extractor's total when it reports one
+            result['playlist_count'] = info.get('playlist_count') or len(entries_list)
             result['playlist_title'] = info.get('title', 'Playlist')
         else:
             result['is_playlist'] = False
-            result['formats'] = info.get('formats', [])
+            result['formats'] = [_summarize_format(f) for f in info.get('formats') or ()]
         
         return result
 
 
-# Global wrapper instance (will be initialized from Kotlin)
+class DownloadQueue:
+    """Priority queue of downloads served by a pool of worker threads"""
+    
+    def __init__(self,
+                 wrapper: YtdlpWrapper,
+                 workers: int = 3,
+                 max_retries: int = 3,
+                 backoff_base: float = 2.0,
+                 event_callback: Optional[Callable] = None,
+                 progress_callback: Optional[Callable] = None):
+        self.wrapper = wrapper
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.event_callback = event_callback
+        self.progress_callback = progress_callback
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._threads: List[threading.Thread] = []
+        self._stopped = threading.Event()
+        # Guards _stopped transitions against puts, so stop() can't miss a job
+        self._lock = threading.Lock()
+        # Downloads a worker is running, and retries waiting on their timer
+        self._active: Dict[int, Dict[str, Any]] = {}
+        self._retry_timers: Dict[int, tuple] = {}
+    
+    def start(self):
+        """Start the worker threads"""
+        for index in range(self.workers):
+            thread = threading.Thread(
+                target=self._worker, name=f'ytdlp-download-{index}', daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+    
+    def stop(self, timeout: Optional[float] = None):
+        """
+        Stop the queue and wait (up to timeout seconds per worker) for the workers
+        
+        Queued jobs and pending retries are dropped with a 'cancelled' event;
+        running downloads are cancelled and report through their worker.
+        """
+        dropped: List[Dict[str, Any]] = []
+        with self._lock:
+            self._stopped.set()
+            while True:
+                try:
+                    _, _, job = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if job is not None:
+                    dropped.append(job)
+            for timer, job in self._retry_timers.values():
+                timer.cancel()
+                dropped.append(job)
+            self._retry_timers.clear()
+            running = [job['download_id'] for job in self._active.values()]
+        
+        for job in dropped:
+            self._drop(job)
+        for download_id in running:
+            self.wrapper.cancel_download(download_id)
+        
+        threads, self._threads = self._threads, []
+        for _ in threads:
+            # Sentinels sort ahead of any real job so idle workers exit promptly
+            self._queue.put((float('-inf'), next(self._seq), None))
+        for thread in threads:
+            thread.join(timeout)
+    
+    def submit(self,
+               url: str,
+               download_id: str,
+               format_type: str = 'mp4',
+               quality: str = 'best',
+               priority: int = 0):
+        """
+        Queue a download
+        
+        Args:
+            url: The URL to download
+            download_id: Unique identifier for this download
+            format_type: 'mp4' or 'mp3'
+            quality: 'best', 'high', 'medium', or 'low'
+            priority: Lower values are downloaded first
+        """
+        job = {
+            'url': url,
+            'download_id': download_id,
+            'format_type': format_type,
+            'quality': quality,
+            'priority': priority,
+            'attempt': 0,
+        }
+        self.wrapper.expect_download(download_id)
+        if self._put(job):
+            self._emit_event('queued', download_id)
+        else:
+            self._drop(job)
+    
+    def _put(self, job: Dict[str, Any]) -> bool:
+        with self._lock:
+            if self._stopped.is_set():
+                return False
+            self._queue.put((job['priority'], next(self._seq), job))
+            return True
+    
+    def _retry(self, job: Dict[str, Any]):
+        """Timer callback: requeue a job unless stop() already claimed it"""
+        with self._lock:
+            if self._retry_timers.pop(id(job), None) is None:
+                return
+        if not self._put(job):
+            self._drop(job)
+    
+    def _drop(self, job: Dict[str, Any]):
+        """Report a job that will never run and release its cancel flag"""
+        self.wrapper.forget_download(job['download_id'])
+        self._emit_event('cancelled', job['download_id'], error='Download queue stopped')
+    
+    def _worker(self):
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                # stop() may have drained the queue just after this get()
+                stopped = self._stopped.is_set()
+                if not stopped:
+                    self._active[id(job)] = job
+            if stopped:
+                self._drop(job)
+                continue
+            try:
+                self._run(job)
+            except Exception as e:
+                self._emit_event('failed', job['download_id'], error=f'Unexpected error: {str(e)}')
+            finally:
+                with self._lock:
+                    self._active.pop(id(job), None)
+    
+    def _run(self, job: Dict[str, Any]):
+        download_id = job['download_id']
+        self._emit_event('started', download_id, attempt=job['attempt'])
+        
+        def on_progress(data):
+            if self.progress_callback:
+                self.progress_callback(dict(data, download_id=download_id))
+        
+        result = self.wrapper.download(
+            url=job['url'],
+            download_id=download_id,
+            format_type=job['format_type'],
+            quality=job['quality'],
+            progress_callback=on_progress
+        )
+        
+        if result.get('success'):
+            self._emit_event('completed', download_id, **result)
+        elif result.get('cancelled'):
+            self._emit_event('cancelled', download_id)
+        elif job['attempt'] < self.max_retries and not self._stopped.is_set():
+            job['attempt'] += 1
+            delay = self.backoff_base ** job['attempt']
+            self._emit_event('retrying', download_id, attempt=job['attempt'],
+                             delay=delay, error=result.get('error'))
+            # Re-queue from a timer so the worker is free for other jobs meanwhile;
+            # keep it cancellable while it waits
+            self.wrapper.expect_download(download_id)
+            timer = threading.Timer(delay, self._retry, args=(job,))
+            timer.daemon = True
+            with self._lock:
+                if self._stopped.is_set():
+                    timer = None
+                else:
+                    self._retry_timers[id(job)] = (timer, job)
+            if timer is None:
+                self._drop(job)
+            else:
+                timer.start()
+        else:
+            self._emit_event('failed', download_id, error=result.get('error'))
+    
+    def _emit_event(self, event: str, download_id: str, **extra):
+        if self.event_callback:
+            self.event_callback(dict(extra, event=event, download_id=download_id))
+
+
+# Serializes stdout lines written from several download threads
+_stdout_lock = threading.Lock()
+
+
+def _emit_line(prefix: str, data: Dict[str, Any]):
+    """Write a prefixed JSON line to stdout (captured by Chaquopy)"""
+    buffer = getattr(sys.stdout, 'buffer', None)
+    with _stdout_lock:
+        if orjson is not None and buffer is not None:
+            # Skip the intermediate str: orjson already produces UTF-8 bytes
+            buffer.write(prefix.encode() + b':' + orjson.dumps(data) + b'\n')
+            buffer.flush()
+        else:
+            print(f"{prefix}:{_dumps(data)}", flush=True)
+
+
+def _emit_progress(data: Dict[str, Any]):
+    """Progress callback for downloads"""
+    _emit_line('PROGRESS', data)
+
+
+def _emit_event(data: Dict[str, Any]):
+    """Lifecycle callback for queued downloads"""
+    _emit_line('EVENT', data)
+
+
+# How long shutdown() waits for each worker to finish its (cancelled) download
+SHUTDOWN_JOIN_TIMEOUT = 10.0
+
+# Global wrapper and download queue (will be initialized from Kotlin)
 _wrapper_instance: Optional[YtdlpWrapper] = None
+_queue_instance: Optional[DownloadQueue] = None
+
+# Per-context override of the global wrapper. Chaquopy calls arrive on arbitrary
+# threads (each with a fresh context), so the global stays the default.
+_wrapper_ctx: ContextVar[Optional[YtdlpWrapper]] = ContextVar('ytdlp_wrapper', default=None)
+
+
+def _current_wrapper() -> Optional[YtdlpWrapper]:
+    """Return the wrapper bound to this context, or the global one"""
+    return _wrapper_ctx.get() or _wrapper_instance
+
+
+@contextlib.contextmanager
+def bound_wrapper(wrapper: YtdlpWrapper):
+    """
+    Route module-level calls made in this context to wrapper
+    
+    Lets several wrappers (e.g. different download dirs or network profiles)
+    serve calls side by side, and lets tests use their own instance without
+    touching the global.
+    """
+    token = _wrapper_ctx.set(wrapper)
+    try:
+        yield wrapper
+    finally:
+        _wrapper_ctx.reset(token)
+
+
+def initialize(download_dir: str,
+               cellular: bool = False,
+               max_parallel_downloads: int = 3,
+               progress_fd: int = -1,
+               use_aria2c: bool = False):
+    """
+    Initialize the wrapper with download directory and start the download queue
+    
+    If progress_fd is given (e.g. the write end of a pipe created by Kotlin),
+    'downloading' updates are written there as PROGRESS_RECORD structs instead
+    of PROGRESS: JSON lines; 'finished' events stay JSON.
+    
+    use_aria2c hands plain HTTP(S) downloads to aria2c when it is installed.
+    Progress then arrives only on completion and a download can't be
+    cancelled mid-file, so it is off by default.
+    """
+    global _wrapper_instance, _queue_instance
+    shutdown()
+    _wrapper_instance = YtdlpWrapper(download_dir, use_aria2c=use_aria2c)
+    _wrapper_instance.set_network_profile(cellular)
+    _wrapper_instance.set_progress_fd(progress_fd)
+    _queue_instance = DownloadQueue(
+        _wrapper_instance,
+        workers=max_parallel_downloads,
+        event_callback=_emit_event,
+        progress_callback=_emit_progress
+    )
+    _queue_instance.start()
+
+
+def shutdown():
+    """Stop the download queue and release pooled yt-dlp instances"""
+    global _wrapper_instance, _queue_instance
+    if _queue_instance is not None:
+        # Workers are joined first so the wrapper isn't closed under them
+        _queue_instance.stop(timeout=SHUTDOWN_JOIN_TIMEOUT)
+        _queue_instance = None
+    if _wrapper_instance is not None:
+        _wrapper_instance.close()
+        _wrapper_instance = None
+
+
+def set_network_profile(cellular: bool) -> str:
+    """Retune download chunking for the current network type"""
+    wrapper = _current_wrapper()
+    if wrapper is None:
+        return _dumps({'success': False, 'error': 'Wrapper not initialized'})
+    
+    wrapper.set_network_profile(cellular)
+    return _dumps({'success': True})
+
+
+def set_progress_fd(fd: int) -> str:
+    """Route 'downloading' updates to a binary pipe fd (negative restores JSON lines)"""
+    wrapper = _current_wrapper()
+    if wrapper is None:
+        return _dumps({'success': False, 'error': 'Wrapper not initialized'})
+    
+    wrapper.set_progress_fd(fd)
+    return _dumps({'success': True})
+
 
+def extract_info(url: str, refresh: bool = False) -> str:
+    """Extract video info - returns JSON string; refresh bypasses the metadata cache"""
+    wrapper = _current_wrapper()
+    if wrapper is None:
+        return _dumps({'error': 'Wrapper not initialized'})
+    
+    result = wrapper.extract_info(url, refresh=refresh)
+    return _dumps(result)
 
-def initialize(download_dir: str):
-    """Initialize the wrapper with download directory"""
-    global _wrapper_instance
-    _wrapper_instance = YtdlpWrapper(download_dir)
+
+def clear_metadata_cache() -> str:
+    """Clear the on-disk metadata cache"""
+    wrapper = _current_wrapper()
+    if wrapper is None:
+        return _dumps({'success': False, 'error': 'Wrapper not initialized'})
+    
+    cleared = wrapper.clear_metadata_cache()
+    return _dumps({'success': cleared})
 
 
-def extract_info(url: str) -> str:
-    """Extract video info - returns JSON string"""
-    if _wrapper_instance is None:
-        return json.dumps({'error': 'Wrapper not initialized'})
+def extract_entry(url: str, refresh: bool = False) -> str:
+    """Extract full info for a single video - returns JSON string; refresh bypasses the cache"""
+    wrapper = _current_wrapper()
+    if wrapper is None:
+        return _dumps({'error': 'Wrapper not initialized'})
     
-    result = _wrapper_instance.extract_info(url)
-    return json.dumps(result)
+    result = wrapper.extract_entry(url, refresh=refresh)
+    return _dumps(result)
+
+
+def extract_info_stream(url: str, start: int = 0, limit: Optional[int] = None):
+    """
+    Stream playlist entries - returns an iterator of JSON strings
+    Kotlin can pull entries one at a time as they are discovered
+    """
+    wrapper = _current_wrapper()
+    if wrapper is None:
+        yield _dumps({'error': 'Wrapper not initialized'})
+        return
+    
+    for entry in wrapper.extract_info_stream(url, start, limit):
+        yield _dumps(entry)
 
 
 def get_available_formats(url: str) -> str:
     """Get available formats - returns JSON string"""
-    if _wrapper_instance is None:
-        return json.dumps({'error': 'Wrapper not initialized'})
+    wrapper = _current_wrapper()
+    if wrapper is None:
+        return _dumps({'error': 'Wrapper not initialized'})
     
-    result = _wrapper_instance.get_available_formats(url)
-    return json.dumps(result)
+    result = wrapper.get_available_formats(url)
+    return _dumps(result)
 
 
 def download(url: str, download_id: str, format_type: str, quality: str) -> str:
@@ -319,36 +1534,56 @@ def download(url: str, download_id: str, format_type: str, quality: str) -> str:
     Start a download - returns JSON result
     This is a blocking call that runs the full download
     """
-    if _wrapper_instance is None:
-        return json.dumps({'success': False, 'error': 'Wrapper not initialized'})
-    
-    # Progress callback that prints to stdout (captured by Chaquopy)
-    def progress_callback(data):
-        print(f"PROGRESS:{json.dumps(data)}", flush=True)
+    wrapper = _current_wrapper()
+    if wrapper is None:
+        return _dumps({'success': False, 'error': 'Wrapper not initialized'})
     
-    result = _wrapper_instance.download(
+    result = wrapper.download(
         url=url,
         download_id=download_id,
         format_type=format_type,
         quality=quality,
-        progress_callback=progress_callback
+        progress_callback=_emit_progress
     )
-    return json.dumps(result)
+    return _dumps(result)
+
+
+def submit_download(url: str,
+                    download_id: str,
+                    format_type: str,
+                    quality: str,
+                    priority: int = 0) -> str:
+    """
+    Queue a download - returns immediately
+    Progress and lifecycle updates are printed as PROGRESS:/EVENT: lines
+    
+    The queue runs on the global wrapper, so submitting inside bound_wrapper()
+    is refused; cancel_download() there would go to the bound wrapper instead.
+    """
+    if _queue_instance is None:
+        return _dumps({'success': False, 'error': 'Wrapper not initialized'})
+    if _current_wrapper() is not _queue_instance.wrapper:
+        return _dumps({'success': False, 'error': 'Download queue is not available for a bound wrapper'})
+    
+    _queue_instance.submit(url, download_id, format_type, quality, priority)
+    return _dumps({'success': True, 'queued': True})
 
 
 def cancel_download(download_id: str) -> str:
-    """Cancel an active download"""
-    if _wrapper_instance is None:
-        return json.dumps({'success': False, 'error': 'Wrapper not initialized'})
+    """Cancel a queued or running download; success is False if there was nothing to cancel"""
+    wrapper = _current_wrapper()
+    if wrapper is None:
+        return _dumps({'success': False, 'error': 'Wrapper not initialized'})
     
-    _wrapper_instance.cancel_download(download_id)
-    return json.dumps({'success': True})
+    cancelled = wrapper.cancel_download(download_id)
+    return _dumps({'success': cancelled})
 
 
 def is_valid_url(url: str) -> str:
-    """Check if URL is valid - returns JSON boolean"""
-    if _wrapper_instance is None:
-        return json.dumps({'valid': False, 'error': 'Wrapper not initialized'})
+    """Check if URL is valid - returns JSON with validity and extractor name"""
+    wrapper = _current_wrapper()
+    if wrapper is None:
+        return _dumps({'valid': False, 'error': 'Wrapper not initialized'})
     
-    is_valid = _wrapper_instance.is_valid_url(url)
-    return json.dumps({'valid': is_valid})
+    extractor = wrapper.match_extractor(url)
+    return _dumps({'valid': extractor is not None, 'extractor': extractor})
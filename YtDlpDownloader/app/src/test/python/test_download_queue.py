@@ -0,0 +1,159 @@
+"""
+Checks that every queued download ends with exactly one terminal event,
+whether it completes, fails after its retries or is dropped by stop()
+
+Run from this directory with: python -m unittest test_download_queue
+"""
+
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'main', 'python'))
+
+import ytdlp_wrapper  # noqa: E402
+
+TERMINAL_EVENTS = {'completed', 'failed', 'cancelled'}
+
+# Generous upper bound for anything the tests wait on
+WAIT_TIMEOUT = 5.0
+
+
+class StubWrapper:
+    """Stands in for YtdlpWrapper; results are scripted per download_id"""
+
+    def __init__(self, results=None, block=False):
+        self.results = results or {}
+        self.block = block
+        self.started = threading.Event()
+        self.calls = []
+        self._events = {}
+        self._lock = threading.Lock()
+
+    def expect_download(self, download_id):
+        with self._lock:
+            self._events.setdefault(download_id, threading.Event())
+
+    def forget_download(self, download_id):
+        with self._lock:
+            self._events.pop(download_id, None)
+
+    def cancel_download(self, download_id):
+        with self._lock:
+            event = self._events.get(download_id)
+        if event is None:
+            return False
+        event.set()
+        return True
+
+    def download(self, url, download_id, format_type, quality, progress_callback=None):
+        with self._lock:
+            self.calls.append(download_id)
+            event = self._events.setdefault(download_id, threading.Event())
+        try:
+            if self.block:
+                self.started.set()
+                event.wait(WAIT_TIMEOUT)
+            if event.is_set():
+                return {'success': False, 'cancelled': True}
+            results = self.results.get(download_id)
+            return results.pop(0) if results else {'success': True}
+        finally:
+            self.forget_download(download_id)
+
+
+class DownloadQueueTest(unittest.TestCase):
+
+    def make_queue(self, wrapper, workers=1):
+        self.events = []
+        self.events_lock = threading.Lock()
+        self.done = threading.Condition(self.events_lock)
+
+        def on_event(data):
+            with self.done:
+                self.events.append(data)
+                self.done.notify_all()
+
+        return ytdlp_wrapper.DownloadQueue(
+            wrapper, workers=workers, max_retries=2, backoff_base=0.01,
+            event_callback=on_event
+        )
+
+    def wait_for_terminal(self, count):
+        with self.done:
+            self.assertTrue(
+                self.done.wait_for(lambda: len(self.terminal()) >= count, WAIT_TIMEOUT),
+                f'expected {count} terminal events, got {self.events}'
+            )
+
+    def terminal(self):
+        return [e for e in self.events if e['event'] in TERMINAL_EVENTS]
+
+    def assertOneTerminalEach(self, download_ids):
+        terminal = self.terminal()
+        self.assertEqual(sorted(e['download_id'] for e in terminal), sorted(download_ids))
+
+    def test_completed(self):
+        queue = self.make_queue(StubWrapper())
+        queue.start()
+        queue.submit('https://example.com/a', 'a')
+        self.wait_for_terminal(1)
+        queue.stop(timeout=WAIT_TIMEOUT)
+        self.assertEqual([e['event'] for e in self.events], ['queued', 'started', 'completed'])
+
+    def test_retries_then_fails(self):
+        failure = {'success': False, 'error': 'boom'}
+        wrapper = StubWrapper({'a': [dict(failure) for _ in range(3)]})
+        queue = self.make_queue(wrapper)
+        queue.start()
+        queue.submit('https://example.com/a', 'a')
+        self.wait_for_terminal(1)
+        queue.stop(timeout=WAIT_TIMEOUT)
+        self.assertEqual(wrapper.calls, ['a', 'a', 'a'])
+        self.assertEqual([e['event'] for e in self.events if e['event'] == 'retrying'],
+                         ['retrying', 'retrying'])
+        self.assertEqual(self.terminal()[0]['event'], 'failed')
+        self.assertOneTerminalEach(['a'])
+
+    def test_stop_cancels_running_and_drops_queued(self):
+        wrapper = StubWrapper(block=True)
+        queue = self.make_queue(wrapper)
+        queue.start()
+        queue.submit('https://example.com/a', 'a')
+        self.assertTrue(wrapper.started.wait(WAIT_TIMEOUT))
+        queue.submit('https://example.com/b', 'b')
+        queue.submit('https://example.com/c', 'c')
+        queue.stop(timeout=WAIT_TIMEOUT)
+        self.assertEqual(wrapper.calls, ['a'])
+        self.assertEqual({e['event'] for e in self.terminal()}, {'cancelled'})
+        self.assertOneTerminalEach(['a', 'b', 'c'])
+
+    def test_submit_after_stop_is_dropped(self):
+        wrapper = StubWrapper()
+        queue = self.make_queue(wrapper)
+        queue.start()
+        queue.stop(timeout=WAIT_TIMEOUT)
+        queue.submit('https://example.com/a', 'a')
+        self.assertEqual(wrapper.calls, [])
+        self.assertEqual([e['event'] for e in self.events], ['cancelled'])
+        self.assertEqual(wrapper._events, {})
+
+    def test_job_taken_just_before_stop_is_dropped(self):
+        wrapper = StubWrapper()
+        queue = self.make_queue(wrapper)
+        queue.submit('https://example.com/a', 'a')
+        # Play the worker's side of the race: the job left the queue before
+        # stop() drained it, and is only handed to the worker afterwards
+        item = queue._queue.get_nowait()
+        queue.stop()
+        queue._queue.put(item)
+        queue._queue.put((float('inf'), next(queue._seq), None))
+        queue._worker()
+        self.assertEqual(wrapper.calls, [])
+        self.assertEqual([e['event'] for e in self.events], ['queued', 'cancelled'])
+        self.assertEqual(wrapper._events, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+Checks that the indexed extractor lookup agrees with yt-dlp's own linear scan
+
+Run from this directory with: python -m unittest test_extractor_match
+"""
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'main', 'python'))
+
+import ytdlp_wrapper  # noqa: E402
+
+# Every Nth _TESTS URL keeps the linear reference scan quick
+SAMPLE_STEP = 7
+
+EXTRA_URLS = [
+    'https://example.com/video.mp4',
+    'not a url',
+    '',
+    'https://www.youtube.com/watch?v=BaW_jenozKc&t=ñ',
+    'https://www.YouTube.com/watch?v=BaW_jenozKc',
+]
+
+
+def _sample_urls(extractors):
+    urls = []
+    for extractor in extractors:
+        for test in getattr(type(extractor), '_TESTS', None) or ():
+            if isinstance(test, dict) and isinstance(test.get('url'), str):
+                urls.append(test['url'])
+    return urls[::SAMPLE_STEP] + EXTRA_URLS
+
+
+def _linear_match(extractors, url):
+    """Reference: the first extractor (in yt-dlp order) whose suitable() accepts url"""
+    for extractor in extractors:
+        if extractor.suitable(url):
+            return extractor
+    return None
+
+
+def _name(extractor):
+    return extractor.IE_NAME if extractor is not None else None
+
+
+class MatchExtractorTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Build the tables without the background Hyperscan compile, so each
+        # test decides which lookup path is active
+        with mock.patch.object(ytdlp_wrapper, 'hyperscan', None):
+            cls.extractors = ytdlp_wrapper._ensure_extractors()
+        cls.urls = _sample_urls(cls.extractors)
+        cls.expected = {url: _name(_linear_match(cls.extractors, url)) for url in cls.urls}
+
+    def assertMatchesLinearScan(self):
+        mismatches = []
+        for url, expected in self.expected.items():
+            found = _name(ytdlp_wrapper._match_extractor(url))
+            if found != expected:
+                mismatches.append((url, expected, found))
+        self.assertEqual(mismatches[:20], [], f'{len(mismatches)} of {len(self.urls)} URLs differ')
+
+    def test_regex_lookup(self):
+        with mock.patch.object(ytdlp_wrapper, '_HOST_AUTOMATON', None), \
+                mock.patch.object(ytdlp_wrapper, '_HS_DATABASE', None):
+            self.assertMatchesLinearScan()
+
+    @unittest.skipIf(ytdlp_wrapper.ahocorasick is None, 'pyahocorasick not installed')
+    def test_host_automaton_lookup(self):
+        automaton = ytdlp_wrapper._build_host_automaton(self.extractors)
+        with mock.patch.object(ytdlp_wrapper, '_HOST_AUTOMATON', automaton), \
+                mock.patch.object(ytdlp_wrapper, '_HS_DATABASE', None):
+            self.assertMatchesLinearScan()
+
+    @unittest.skipIf(ytdlp_wrapper.hyperscan is None, 'hyperscan not installed')
+    def test_hyperscan_lookup(self):
+        # Patching first restores the module state after the build below
+        with mock.patch.object(ytdlp_wrapper, '_HOST_AUTOMATON', None), \
+                mock.patch.object(ytdlp_wrapper, '_HS_DATABASE', None), \
+                mock.patch.object(ytdlp_wrapper, '_HS_FALLBACK_IDS', frozenset()):
+            ytdlp_wrapper._build_hyperscan_db(self.extractors)
+            if ytdlp_wrapper._HS_DATABASE is None:
+                self.skipTest('Hyperscan database failed to compile')
+            self.assertMatchesLinearScan()
+
+
+if __name__ == '__main__':
+    unittest.main()